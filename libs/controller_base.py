@@ -1,71 +1,182 @@
 from abc import ABC, abstractmethod
-from atexit import register
+from asyncio import CancelledError, get_running_loop, shield, wait
 from configparser import ConfigParser
-from logging import getLogger, debug, info
+from functools import lru_cache
+from logging import getLogger, debug, error, info
 from pathlib import Path
-from threading import Thread, Lock
-from typing import Dict, Optional
+from threading import Thread, Event, get_ident
+from types import MappingProxyType
+from typing import Callable, List, Mapping, NamedTuple, Union
+import numpy as np
 
 
 logger = getLogger(__name__)
 
+_RIGHT_STICK_DIRECTIONS = ('left', 'right', 'forward', 'backward')
+_LEFT_STICK_DIRECTIONS = ('counterclockwise', 'clockwise', 'up', 'down')
+_DIRECTION_NONE = 0
+_DIRECTION_NEGATIVE_X = 1
+_DIRECTION_POSITIVE_X = 2
+_DIRECTION_NEGATIVE_Y = 3
+_DIRECTION_POSITIVE_Y = 4
+_STICK_DIRECTION_KEYS = np.array([
+    _DIRECTION_POSITIVE_Y, _DIRECTION_POSITIVE_X, _DIRECTION_NEGATIVE_Y, _DIRECTION_POSITIVE_X,
+    _DIRECTION_POSITIVE_Y, _DIRECTION_NEGATIVE_X, _DIRECTION_NEGATIVE_Y, _DIRECTION_NEGATIVE_X
+], dtype=np.uint8)
+_RIGHT_STICK_STATES = tuple(
+    MappingProxyType({name: index == direction for index, name in enumerate(_RIGHT_STICK_DIRECTIONS, 1)})
+    for direction in range(len(_RIGHT_STICK_DIRECTIONS) + 1)
+)
+_LEFT_STICK_STATES = tuple(
+    MappingProxyType({name: index == direction for index, name in enumerate(_LEFT_STICK_DIRECTIONS, 1)})
+    for direction in range(len(_LEFT_STICK_DIRECTIONS) + 1)
+)
+
+
+class ControllerState(NamedTuple):
+    """
+    Immutable snapshot of the digital buttons and both analog sticks of a controller.
+
+    :ivar buttons: A read-only view of the digital button status.
+    :ivar right_stick: A read-only view of the state of the analog right stick.
+    :ivar left_stick: A read-only view of the state of the analog left stick.
+    """
+
+    buttons: Mapping[str, bool]
+    right_stick: Mapping[str, bool]
+    left_stick: Mapping[str, bool]
+
+
+def _coerce_value(value: str) -> Union[int, str]:
+    """
+    Converts a configuration value to int if possible. Integer literals with a base
+    prefix (e.g. 0x18d1 for hexadecimal vendor and product IDs) are supported, plain
+    numbers with leading zeros are read as decimal.
+
+    :param value: The raw configuration value.
+    :type value: str
+    :return: The value as int, otherwise the unchanged string.
+    :rtype: Union[int, str]
+    """
+    try:
+        return int(value, 0)
+    except ValueError:
+        pass
+
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+@lru_cache(maxsize=8)
+def _read_configuration(path: str, mtime: float) -> Mapping[str, Mapping[str, Union[int, str]]]:
+    """
+    Parses a controller configuration file and caches its sections as read-only mappings
+    with all numeric values already converted to int. The modification time is part of
+    the cache key, so a changed file is parsed again.
+
+    :param path: The path of the configuration file.
+    :type path: str
+    :param mtime: The modification time of the configuration file.
+    :type mtime: float
+    :return: The configuration values by section and key.
+    :rtype: Mapping[str, Mapping[str, Union[int, str]]]
+    """
+    _ = mtime
+
+    config = ConfigParser(strict=True)
+    config.read(path)
+
+    return MappingProxyType({
+        section: MappingProxyType({key: _coerce_value(value) for key, value in config[section].items()})
+        for section in config.sections()
+    })
+
 
 class BaseController(ABC):
     """
     Abstract base class for all controller implementations.
     Defines the interface that each controller must implement.
 
-    :ivar _REQUIRED_SECTIONS: A list of required sections in the configuration file.
-    :ivar _AXIS_KEYS: A list of axis keys for analog stick mapping.
+    :ivar _REQUIRED_SECTIONS: The required sections in the configuration file.
+    :ivar _AXIS_SHIFTS: The bit offsets of the axis values in the packed axis value.
+    :ivar _AXIS_RANGE: The number of possible values of an 8-bit analog stick axis.
+    :ivar _JOIN_TIMEOUT: The time (seconds) to wait for the reader thread on close.
     """
 
-    _REQUIRED_SECTIONS = ['Identification', 'Buttons', 'AnalogSticks']
-    _AXIS_KEYS = ['left_x', 'left_y', 'right_x', 'right_y']
+    _REQUIRED_SECTIONS = ('Identification', 'Buttons', 'AnalogSticks')
+    _AXIS_SHIFTS = {'left_y': 0, 'left_x': 8, 'right_y': 16, 'right_x': 24}
+    _AXIS_RANGE = 256
+    _JOIN_TIMEOUT = 1.0
 
-    def __init__(self, file_name: str):
+    def __init__(self, file_name: str, use_thread: bool = True):
         """
         Represents a controller interface for handling configuration, connections, and
         interaction with a controller device via hidapi.
 
         :param file_name: The configuration file name for the controller.
         :type file_name: str
+        :param use_thread: Read the controller on a background thread, otherwise await run().
+        :type use_thread: bool
         """
         self._configuration_file_name = str(file_name)
         self._config = None
         self._controller = None
+        self._btn = None
         self._analog_middle = None
         self._analog_threshold = None
-        self._axis_values = {key: 0 for key in self._AXIS_KEYS}
+        self._axis_packed = 0
+        self._stop = Event()
+        self._thread = None
+        self._reader_done = Event()
+        self._reader_done.set()
+        self._reader_ident = None
 
         self._load_controller_configuration()
         self._connect_to_controller()
+        self._load_steering_configuration()
         self._initialize_steering()
 
-        self._btn_status = {
-            'TAKEOFF': False,
-            'LANDING': False,
-            'PHOTO': False
-        }
-
-        self._analog_right_stick = {
-            "forward": False,
-            "backward": False,
-            "left": False,
-            "right": False
-        }
+        self._btn_bits = {name: 1 << index for index, name in enumerate(self._btn)}
+        self._btn_states = tuple(
+            MappingProxyType({name: bool(btn_status & bit) for name, bit in self._btn_bits.items()})
+            for btn_status in range(1 << len(self._btn_bits))
+        )
+        self._btn_status = 0
+
+        self._stick_lut = self._build_stick_lut(self._analog_middle, self._analog_threshold)
+        self._right_stick_direction = _DIRECTION_NONE
+        self._left_stick_direction = _DIRECTION_NONE
+        self._state_indices = (0, _DIRECTION_NONE, _DIRECTION_NONE)
+        self._state = ControllerState(
+            self._btn_states[0],
+            _RIGHT_STICK_STATES[_DIRECTION_NONE],
+            _LEFT_STICK_STATES[_DIRECTION_NONE]
+        )
+        self._subscribers: List[Callable[[Mapping[str, bool], Mapping[str, bool], Mapping[str, bool]], None]] = []
+
+        if use_thread:
+            self._reader_done.clear()
+            self._thread = Thread(target=self._run_reader, daemon=True)
+            self._thread.start()
+
+    def __enter__(self) -> 'BaseController':
+        """
+        Enters the runtime context of the controller.
 
-        self._analog_left_stick = {
-            "up": False,
-            "down": False,
-            "clockwise": False,
-            "counterclockwise": False
-        }
+        :return: The controller itself.
+        :rtype: BaseController
+        """
+        return self
 
-        register(self._close)
+    def __exit__(self, *exc_info) -> None:
+        """
+        Exits the runtime context of the controller and closes the connection.
 
-        self._lock = Lock()
-        self._thread = Thread(target=self._read_controller, daemon=True)
-        self._thread.start()
+        :return: None
+        """
+        self._close()
 
     def _load_controller_configuration(self) -> None:
         """
@@ -81,124 +192,247 @@ class BaseController(ABC):
         if not config_path.exists():
             raise FileNotFoundError(f'Configuration file "{config_path}" not found.')
 
-        config = ConfigParser(strict=True)
-        config.read(config_path)
+        config = _read_configuration(str(config_path), config_path.stat().st_mtime)
 
-        for section in self._REQUIRED_SECTIONS:
-            if section not in config:
-                raise ValueError(f'Missing config section: {section}')
+        missing_sections = [section for section in self._REQUIRED_SECTIONS if section not in config]
+
+        if missing_sections:
+            raise ValueError(f'Missing config sections: {", ".join(missing_sections)}')
 
         self._config = config
 
-    def _set_right_stick_active(self, direction: Optional[str]) -> None:
+    def _load_steering_configuration(self) -> None:
         """
-        Sets the state of the right stick to be active in the specified direction.
+        Loads the button values, the analog middle value and the analog threshold value,
+        which are shared by all controller implementations.
 
-        :param direction: The direction to set the right analog stick to be active.
-        :type direction: Optional[str]
+        :raises ValueError: If any required configuration section values are missing.
         :return: None
         """
-        for key in self._analog_right_stick.keys():
-            self._analog_right_stick[key] = False
-
-        if direction is not None:
-            self._analog_right_stick[direction] = True
+        btn_section = self._config['Buttons']
+
+        try:
+            self._btn = {
+                'TAKEOFF': btn_section['btn_takeoff_value'],
+                'LANDING': btn_section['btn_landing_value'],
+                'PHOTO': btn_section['btn_photo_value']
+            }
+        except KeyError:
+            raise ValueError(f'Failed to load correct button configuration.')
+
+        analog_section = self._config['AnalogSticks']
+
+        try:
+            self._analog_middle = analog_section['analog_middle_value']
+            self._analog_threshold = analog_section['analog_threshold_value']
+        except KeyError:
+            raise ValueError(f'Failed to load correct analog stick configuration.')
+
+        self._axis_packed = sum(self._analog_middle << shift for shift in self._AXIS_SHIFTS.values())
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_stick_lut(middle: int, threshold: int) -> bytes:
+        """
+        Precomputes the stick direction for every possible pair of 8-bit axis values.
+        The table is indexed by (x << 8) | y and holds one of the _DIRECTION_* constants,
+        _DIRECTION_NONE in the dead zone. Outside the
+        dead zone the direction only depends on the signs of both axes and the dominant
+        axis, which form the 3-bit key into _STICK_DIRECTION_KEYS.
+
+        :param middle: The analog stick middle value.
+        :type middle: int
+        :param threshold: The analog stick dead zone around the middle value.
+        :type threshold: int
+        :return: The direction lookup table.
+        :rtype: bytes
+        """
+        axis = np.arange(BaseController._AXIS_RANGE, dtype=np.int16) - middle
+        delta_x = axis[:, np.newaxis]
+        delta_y = axis[np.newaxis, :]
+        magnitude_x = np.abs(delta_x)
+        magnitude_y = np.abs(delta_y)
+
+        key = (
+            (delta_x < 0).astype(np.uint8) << 2 |
+            (delta_y < 0).astype(np.uint8) << 1 |
+            (magnitude_x > magnitude_y).astype(np.uint8)
+        )
+        outside_dead_zone = np.maximum(magnitude_x, magnitude_y) > threshold
+        lut = np.where(outside_dead_zone, _STICK_DIRECTION_KEYS[key], _DIRECTION_NONE)
+
+        return lut.astype(np.uint8).tobytes()
+
+    def _publish_state(self) -> None:
+        """
+        Publishes the current button and analog stick state for the getters and notifies
+        the subscribers, unchanged states are skipped. The state is an immutable snapshot
+        which is rebound in a single store, so readers never see a partial update. A failing
+        subscriber is logged and neither stops the reader nor the following subscribers.
 
-    def _set_left_stick_active(self, direction: Optional[str]) -> None:
+        :return: None
         """
-        Sets the state of the left stick to be active in the specified direction.
+        state_indices = (self._btn_status, self._right_stick_direction, self._left_stick_direction)
+
+        if state_indices == self._state_indices:
+            return
+
+        self._state_indices = state_indices
+        state = ControllerState(
+            self._btn_states[state_indices[0]],
+            _RIGHT_STICK_STATES[state_indices[1]],
+            _LEFT_STICK_STATES[state_indices[2]]
+        )
+        self._state = state
+
+        for callback in self._subscribers:
+            try:
+                callback(*state)
+            except Exception as err:
+                error(f'Controller callback error: "{err}".')
+
+    def on_change(self, callback: Callable[[Mapping[str, bool], Mapping[str, bool], Mapping[str, bool]], None]) -> None:
+        """
+        Registers a callback which is called on every change of the button or analog stick
+        state with the button status, the right stick state and the left stick state. The
+        callbacks run on the reader thread and should return quickly.
 
-        :param direction: The direction to set the left analog stick to be active.
-        :type direction: Optional[str]
+        :param callback: The function to call on a state change.
+        :type callback: Callable[[Mapping[str, bool], Mapping[str, bool], Mapping[str, bool]], None]
         :return: None
         """
-        for key in self._analog_left_stick.keys():
-            self._analog_left_stick[key] = False
+        self._subscribers.append(callback)
+
+    def get_state(self) -> ControllerState:
+        """
+        Retrieves a consistent snapshot of the buttons and both analog sticks.
 
-        if direction is not None:
-            self._analog_left_stick[direction] = True
+        :return: The current controller state.
+        :rtype: ControllerState
+        """
+        return self._state
 
-    def get_btn_status(self) -> Dict[str, bool]:
+    def get_btn_status(self) -> Mapping[str, bool]:
         """
         Retrieves the current digital button status.
 
-        :return: The current digital button status.
-        :rtype: Dict[str, bool]
+        :return: A read-only view of the current digital button status.
+        :rtype: Mapping[str, bool]
         """
-        with self._lock:
-            return self._btn_status.copy()
+        return self._state.buttons
 
-    def get_analog_right_stick(self) -> Dict[str, bool]:
+    def get_analog_right_stick(self) -> Mapping[str, bool]:
         """
         Retrieves the current state of the analog right stick.
 
-        :return: The current state of the analog right stick.
-        :rtype: Dict[str, bool]
+        :return: A read-only view of the current state of the analog right stick.
+        :rtype: Mapping[str, bool]
         """
-        with self._lock:
-            return self._analog_right_stick.copy()
+        return self._state.right_stick
 
-    def get_analog_left_stick(self) -> Dict[str, bool]:
+    def get_analog_left_stick(self) -> Mapping[str, bool]:
         """
         Retrieves the current state of the analog left stick.
 
-        :return: The current state of the analog left stick.
-        :rtype: Dict[str, bool]
+        :return: A read-only view of the current state of the analog left stick.
+        :rtype: Mapping[str, bool]
         """
-        with self._lock:
-            return self._analog_left_stick.copy()
+        return self._state.left_stick
 
-    def _evaluate_analog_sticks(self) -> None:
+    def is_active(self, stick: str, direction: str) -> bool:
         """
-        Interprets analog stick input based on axis values and updates the stick state.
+        Checks whether an analog stick is currently pushed in the given direction.
+
+        :param stick: The analog stick, either "right" or "left".
+        :type stick: str
+        :param direction: The direction of the analog stick (e.g. "forward").
+        :type direction: str
+        :raises ValueError: If the analog stick is unknown.
+        :return: True if the analog stick is pushed in the given direction.
+        :rtype: bool
+        """
+        if stick == 'right':
+            return self.get_analog_right_stick()[direction]
+        elif stick == 'left':
+            return self.get_analog_left_stick()[direction]
+        else:
+            raise ValueError(f'Unknown analog stick: "{stick}".')
+
+    def _run_reader(self) -> None:
+        """
+        Runs the read loop on the calling thread (background thread or executor) and
+        signals when it has finished, so the controller is never closed while it is read.
 
         :return: None
         """
-        right_x = self._axis_values['right_x']
-        right_y = self._axis_values['right_y']
+        self._reader_ident = get_ident()
 
-        debug(f"right_x: {right_x}, right_y: {right_y}")
+        try:
+            self._read_controller()
+        finally:
+            self._reader_ident = None
+            self._reader_done.set()
 
-        if abs(right_x - self._analog_middle) > abs(right_y - self._analog_middle):
-            if right_x + self._analog_threshold < self._analog_middle:
-                self._set_right_stick_active("left")
-            elif right_x - self._analog_threshold > self._analog_middle:
-                self._set_right_stick_active("right")
-            else:
-                self._set_right_stick_active(None)
-        else:
-            if right_y + self._analog_threshold < self._analog_middle:
-                self._set_right_stick_active("forward")
-            elif right_y - self._analog_threshold > self._analog_middle:
-                self._set_right_stick_active("backward")
-            else:
-                self._set_right_stick_active(None)
-
-        left_x = self._axis_values['left_x']
-        left_y = self._axis_values['left_y']
-
-        debug(f"left_x: {left_x}, left_y: {left_y}")
-
-        if abs(left_x - self._analog_middle) > abs(left_y - self._analog_middle):
-            if left_x + self._analog_threshold < self._analog_middle:
-                self._set_left_stick_active("counterclockwise")
-            elif left_x - self._analog_threshold > self._analog_middle:
-                self._set_left_stick_active("clockwise")
-            else:
-                self._set_left_stick_active(None)
-        else:
-            if left_y + self._analog_threshold < self._analog_middle:
-                self._set_left_stick_active("up")
-            elif left_y - self._analog_threshold > self._analog_middle:
-                self._set_left_stick_active("down")
-            else:
-                self._set_left_stick_active(None)
+    def _stop_reader(self) -> bool:
+        """
+        Signals the read loop to stop and waits until the reader (background thread or
+        executor of run()) has finished, so the controller can be closed without being
+        read concurrently. Called from the reader itself, the wait is skipped.
 
-    def __del__(self):
+        :return: True if no reader is running anymore, otherwise False.
+        :rtype: bool
         """
-        Ensures proper cleanup when the controller object is garbage-collected.
+        self._stop.set()
+
+        if self._reader_ident == get_ident():
+            return True
+
+        if not self._reader_done.wait(timeout=self._JOIN_TIMEOUT):
+            error('Controller reader did not stop in time.')
+            return False
+
+        return True
+
+    async def run(self) -> None:
         """
-        self._close()
+        Reads the controller's state on the running asyncio event loop instead of the
+        background thread (requires use_thread=False). By default, the blocking read
+        loop runs in the default executor of the event loop. If the task is cancelled,
+        the read loop is stopped and awaited before the cancellation is passed on.
+
+        :return: None
+        """
+        self._reader_done.clear()
+        reader = get_running_loop().run_in_executor(None, self._run_reader)
+
+        try:
+            await shield(reader)
+        except CancelledError:
+            self._stop.set()
+            await wait((reader,))
+            raise
+
+    def _evaluate_analog_sticks(self) -> None:
+        """
+        Interprets analog stick input based on axis values and updates the stick state.
+        The axis values are packed as right_x, right_y, left_x, left_y from the most to
+        the least significant byte, so each 16-bit half is a key of the lookup table.
+
+        :return: None
+        """
+        axis_packed = self._axis_packed
+        stick_lut = self._stick_lut
+
+        right_key = axis_packed >> 16
+        left_key = axis_packed & 0xFFFF
+
+        debug('right_x: %s, right_y: %s', right_key >> 8, right_key & 0xFF)
+
+        self._right_stick_direction = stick_lut[right_key]
+
+        debug('left_x: %s, left_y: %s', left_key >> 8, left_key & 0xFF)
+
+        self._left_stick_direction = stick_lut[left_key]
 
     @abstractmethod
     def _connect_to_controller(self) -> None:
@@ -1,52 +1,82 @@
+from asyncio import AbstractEventLoop, Future, get_running_loop
 from logging import getLogger, info, error
+from selectors import DefaultSelector, EVENT_READ
 from sys import exit
-from typing import Optional
+from threading import Event
+from typing import Dict, Optional
 from evdev import InputDevice, list_devices, ecodes
 from libs.controller_base import BaseController
 
 
 logger = getLogger(__name__)
 
+_device_path_cache: Dict[str, str] = {}
+
 
 class EvDevController(BaseController):
     """
     Manages a controller connection and provides mechanisms to access and update controller states.
+
+    :ivar _TIMEOUT: The timeout (milliseconds) of waiting for controller events.
     """
 
-    def __init__(self, file_name: str):
+    _TIMEOUT: int = 200
+
+    def __init__(self, file_name: str, use_thread: bool = True):
         """
         Represents a controller interface for handling configuration, connections, and
         interaction with a controller device via evdev.
 
         :param file_name: The configuration file name for the controller.
         :type file_name: str
+        :param use_thread: Read the controller on a background thread, otherwise await run().
+        :type use_thread: bool
         """
-        super().__init__(file_name)
+        self._run_loop: Optional[AbstractEventLoop] = None
+        self._run_future: Optional[Future] = None
+        self._run_fd: Optional[int] = None
+
+        super().__init__(file_name, use_thread)
 
     @staticmethod
     def _search_device(name: str) -> Optional[str]:
         """
         Searches for an input device by its name and returns the corresponding device path if found.
+        A previously found path is reused as long as the device behind it still has a matching
+        name, because event device numbers are reused after the device was plugged in again.
 
         :param name: The name of the device to search for.
         :type name: str
-        :return: The path of the first matching input device, if found.
+        :return: The path of the first matching input device, or None if not found.
         :rtype: Optional[str]
         """
-        found_devices = []
-        input_paths = list_devices()
+        search_name = name.lower()
+        cached_path = _device_path_cache.pop(name, None)
+
+        if cached_path is not None:
+            try:
+                device = InputDevice(cached_path)
+            except OSError:
+                pass
+            else:
+                device_name = device.name
+                device.close()
+
+                if search_name in device_name.lower():
+                    _device_path_cache[name] = cached_path
+                    return cached_path
 
         info(f'Searching for controller "{name}".')
-        for path in input_paths:
+        for path in list_devices():
             device = InputDevice(path)
-            if name.lower() in device.name.lower():
-                found_devices.append((device.name, path))
+            device_name = device.name
+            device.close()
 
-        if found_devices:
-            return found_devices[0][1]
-        else:
-            error(f'Controller "{name}" not found.')
-            exit(1)
+            if search_name in device_name.lower():
+                _device_path_cache[name] = path
+                return path
+
+        return None
 
     def _connect_to_controller(self) -> None:
         """
@@ -61,6 +91,10 @@ class EvDevController(BaseController):
         controller_name = identification_section['name']
         controller_path = EvDevController._search_device(name=controller_name)
 
+        if controller_path is None:
+            error(f'Controller "{controller_name}" not found.')
+            exit(1)
+
         try:
             self._controller = InputDevice(controller_path)
             info(f'Connected with "{self._controller.name}" controller.')
@@ -70,82 +104,208 @@ class EvDevController(BaseController):
 
     def _initialize_steering(self) -> None:
         """
-        Initializes the steering configuration for various control parameters. This
-        method sets up the internal properties such as button statuses, analog stick
-        mappings, and other configuration details necessary for steering operations.
+        Initializes the evdev specific steering configuration. This method maps the
+        configured analog stick axes to their evdev event codes.
 
         :raises ValueError: If any required configuration section values are missing.
         :return: None
         """
         info('Initializing controller steering.')
 
-        btn_section = self._config['Buttons']
-
-        try:
-            self._btn = {
-                'TAKEOFF': int(btn_section['btn_takeoff_value']),
-                'LANDING': int(btn_section['btn_landing_value']),
-                'PHOTO': int(btn_section['btn_photo_value'])
-            }
-        except AttributeError:
-            raise ValueError(f'Failed to load correct button configuration.')
-
         analog_section = self._config['AnalogSticks']
 
         try:
-            self._analog_middle = int(analog_section['analog_middle_value'])
-            self._analog_threshold = int(analog_section['analog_threshold_value'])
             self._axis_left_x = getattr(ecodes, analog_section['analog_left_x_index'])
             self._axis_left_y = getattr(ecodes, analog_section['analog_left_y_index'])
             self._axis_right_x = getattr(ecodes, analog_section['analog_right_x_index'])
             self._axis_right_y = getattr(ecodes, analog_section['analog_right_y_index'])
-        except AttributeError:
+        except (AttributeError, KeyError):
             raise ValueError(f'Failed to load correct analog stick configuration.')
 
-        self._axis_values = {
-            'left_x': self._analog_middle,
-            'left_y': self._analog_middle,
-            'right_x': self._analog_middle,
-            'right_y': self._analog_middle
+        self._code_to_btn = {code: name for name, code in self._btn.items()}
+        self._code_to_axis = {
+            self._axis_left_x: self._AXIS_SHIFTS['left_x'],
+            self._axis_left_y: self._AXIS_SHIFTS['left_y'],
+            self._axis_right_x: self._AXIS_SHIFTS['right_x'],
+            self._axis_right_y: self._AXIS_SHIFTS['right_y']
         }
 
+    def _finish_run(self, err: Optional[BaseException] = None) -> None:
+        """
+        Removes the device from the event loop and ends a running run() coroutine. Must be
+        called on the thread of the event loop, repeated calls are ignored.
+
+        :param err: The error which ends run(), None if run() ends regularly.
+        :type err: Optional[BaseException]
+        :return: None
+        """
+        loop = self._run_loop
+        future = self._run_future
+
+        if loop is None or future is None:
+            return
+
+        loop.remove_reader(self._run_fd)
+
+        if not future.done():
+            if err is None:
+                future.set_result(None)
+            else:
+                future.set_exception(err)
+
+    def _stop_reader(self) -> bool:
+        """
+        Signals the read loop to stop and ends a running run() coroutine, so the device is
+        no longer watched by the event loop when it is closed.
+
+        :return: True if no reader is running anymore, otherwise False.
+        :rtype: bool
+        """
+        loop = self._run_loop
+
+        if loop is not None and not loop.is_closed():
+            try:
+                running_loop = get_running_loop()
+            except RuntimeError:
+                running_loop = None
+
+            if running_loop is loop:
+                self._finish_run()
+            else:
+                finished = Event()
+
+                def finish() -> None:
+                    self._finish_run()
+                    finished.set()
+
+                loop.call_soon_threadsafe(finish)
+                finished.wait(timeout=self._JOIN_TIMEOUT)
+
+        return super()._stop_reader()
+
     def _close(self) -> None:
         """
-        Closes the connection to the controller.
+        Closes the connection to the controller, repeated calls are ignored.
 
         :return: None
         """
+        if not self._stop_reader():
+            return
+
         if self._controller:
             info('Disconnect from controller.')
+            self._controller.close()
             self._controller = None
 
+    def _process_events(self) -> None:
+        """
+        Drains and processes all events currently queued on the controller device. The
+        events of a batch are applied first, then the analog sticks are evaluated and
+        the state is published once.
+
+        :return: None
+        """
+        try:
+            events = list(self._controller.read())
+        except BlockingIOError:
+            return
+
+        ev_key = ecodes.EV_KEY
+        ev_abs = ecodes.EV_ABS
+        code_to_btn = self._code_to_btn
+        code_to_axis = self._code_to_axis
+        btn_bits = self._btn_bits
+        axis_packed = self._axis_packed
+        axis_max = self._AXIS_RANGE - 1
+        btn_status = self._btn_status
+        btn_changed = False
+        axis_changed = False
+
+        for event in events:
+            event_type = event.type
+
+            if event_type == ev_key:
+                btn_name = code_to_btn.get(event.code)
+
+                if btn_name is not None:
+                    if event.value == 1:
+                        btn_status |= btn_bits[btn_name]
+                    elif event.value == 0:
+                        btn_status &= ~btn_bits[btn_name]
+
+                    btn_changed = True
+
+            elif event_type == ev_abs:
+                shift = code_to_axis.get(event.code)
+
+                if shift is not None:
+                    value = min(max(event.value, 0), axis_max)
+                    axis_packed = (axis_packed & ~(axis_max << shift)) | (value << shift)
+                    axis_changed = True
+
+        if axis_changed:
+            self._axis_packed = axis_packed
+            self._evaluate_analog_sticks()
+
+        if btn_changed or axis_changed:
+            self._btn_status = btn_status
+            self._publish_state()
+
     def _read_controller(self) -> None:
         """
         Reads and processes input data from a connected controller in a continuous loop.
+        Waits until the device is readable and then drains all queued events at once.
+        The wait is bounded by a timeout so the loop can be stopped.
 
         :return: None
         """
+        timeout = self._TIMEOUT / 1000
+        stop = self._stop
+        process_events = self._process_events
+
         try:
-            for event in self._controller.read_loop():
-                with self._lock:
-                    if event.type == ecodes.EV_KEY:
-                        for btn_name, btn_code in self._btn.items():
-                            if event.code == btn_code:
-                                if event.value == 1:
-                                    self._btn_status[btn_name] = True
-                                elif event.value == 0:
-                                    self._btn_status[btn_name] = False
-
-                    elif event.type == ecodes.EV_ABS:
-                        if event.code == self._axis_right_x:
-                            self._axis_values['right_x'] = event.value
-                        elif event.code == self._axis_right_y:
-                            self._axis_values['right_y'] = event.value
-                        elif event.code == self._axis_left_x:
-                            self._axis_values['left_x'] = event.value
-                        elif event.code == self._axis_left_y:
-                            self._axis_values['left_y'] = event.value
-
-                        self._evaluate_analog_sticks()
+            with DefaultSelector() as selector:
+                selector.register(self._controller.fd, EVENT_READ)
+
+                while not stop.is_set():
+                    if selector.select(timeout):
+                        process_events()
         except Exception as err:
             error(f'Controller event error: {err}')
+
+    def _process_ready_events(self) -> None:
+        """
+        Processes the queued events when the event loop reports the device as readable.
+        If the device can no longer be read (e.g. it was unplugged), it is removed from
+        the event loop and run() ends with the error.
+
+        :return: None
+        """
+        try:
+            self._process_events()
+        except OSError as err:
+            error(f'Controller event error: {err}')
+            self._finish_run(err)
+
+    async def run(self) -> None:
+        """
+        Reads the controller's state on the running asyncio event loop instead of the
+        background thread (requires use_thread=False). The event loop watches the device
+        file descriptor and processes the events as soon as they arrive. The coroutine
+        ends when the controller is closed and raises an error if the device fails.
+
+        :raises OSError: If the controller device can no longer be read.
+        :return: None
+        """
+        loop = get_running_loop()
+        self._run_fd = self._controller.fd
+        self._run_future = loop.create_future()
+        self._run_loop = loop
+        loop.add_reader(self._run_fd, self._process_ready_events)
+
+        try:
+            await self._run_future
+        finally:
+            loop.remove_reader(self._run_fd)
+            self._run_loop = None
+            self._run_future = None
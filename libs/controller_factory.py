@@ -1,3 +1,4 @@
+from importlib import import_module
 from logging import getLogger, debug
 from platform import system
 from libs.controller_base import BaseController
@@ -5,6 +6,12 @@ from libs.controller_base import BaseController
 
 logger = getLogger(__name__)
 
+_SYSTEM_NAME = system()
+_BACKENDS = {
+    'Darwin': ('libs.controller_hid', 'HidController', 'hidapi'),
+    'Linux': ('libs.controller_evdev', 'EvDevController', 'evdev')
+}
+
 
 class ControllerFactory:
     """
@@ -15,24 +22,25 @@ class ControllerFactory:
         """
         Represents a class with system information to provide correct controller instances.
         """
-        self._system_name = system()
+        self._system_name = _SYSTEM_NAME
 
-    def create(self, name: str) -> BaseController:
+    def create(self, name: str, use_thread: bool = True) -> BaseController:
         """
         Creates and returns a `BaseController` instance based on the operating system.
+        Only the module of the selected controller implementation is imported.
 
         :param name: The name of the controller to be created.
         :type name: str
+        :param use_thread: Read the controller on a background thread, otherwise await run().
+        :type use_thread: bool
         :return: An instance of `BaseController` initialized with the given name.
         :rtype: BaseController
         """
-        if self._system_name == 'Darwin':
-            debug('Using Python hidapi controller.')
-            from libs.controller_hid import HidController
-            return HidController(file_name=name)
-        elif self._system_name == 'Linux':
-            debug('Using Python evdev controller.')
-            from libs.controller_evdev import EvDevController
-            return EvDevController(file_name=name)
-        else:
+        try:
+            module_name, class_name, library_name = _BACKENDS[self._system_name]
+        except KeyError:
             raise OSError(f'Unsupported system: "{self._system_name}".')
+
+        debug(f'Using Python {library_name} controller.')
+        controller_class = getattr(import_module(module_name), class_name)
+        return controller_class(file_name=name, use_thread=use_thread)
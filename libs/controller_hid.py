@@ -1,6 +1,6 @@
 from logging import getLogger, info, error
+from operator import itemgetter
 from sys import exit
-from time import sleep
 from hid import device
 from libs.controller_base import BaseController
 
@@ -12,34 +12,36 @@ class HidController(BaseController):
     """
     Manages a controller connection and provides mechanisms to access and update controller states.
 
-    :ivar _DELAY: The delay between controller reads in seconds.
+    :ivar _TIMEOUT: The timeout (milliseconds) of a blocking controller read.
     """
 
-    _DELAY: float = 0.01
+    _TIMEOUT: int = 200
 
-    def __init__(self, file_name: str):
+    def __init__(self, file_name: str, use_thread: bool = True):
         """
         Represents a controller interface for handling configuration, connections, and
         interaction with a controller device via hidapi.
 
         :param file_name: The configuration file name for the controller.
         :type file_name: str
+        :param use_thread: Read the controller on a background thread, otherwise await run().
+        :type use_thread: bool
         """
-        super().__init__(file_name)
+        super().__init__(file_name, use_thread)
 
     def _connect_to_controller(self) -> None:
         """
         Attempts to connect to the controller device using configuration values
         for vendor and product IDs, initializes the controller object, and sets
-        it to non-blocking mode.
+        it to non-blocking mode (reads with a timeout still block up to the timeout).
 
         :raises Exception: If the connection to the controller fails.
         :return: None
         """
         info('Connecting to controller.')
         identification_section = self._config['Identification']
-        vendor = int(identification_section['vendor'])
-        product = int(identification_section['product'])
+        vendor = identification_section['vendor']
+        product = identification_section['product']
 
         try:
             self._controller = device()
@@ -53,79 +55,116 @@ class HidController(BaseController):
 
     def _initialize_steering(self) -> None:
         """
-        Initializes the steering configuration for various control parameters. This
-        method sets up the internal properties such as button statuses, analog stick
-        mappings, and other configuration details necessary for steering operations.
+        Initializes the hidapi specific steering configuration. This method sets up
+        the report length and the byte indices of the buttons and analog stick axes.
 
         :raises ValueError: If any required configuration section values are missing.
         :return: None
         """
         info('Initializing controller steering.')
         identification_section = self._config['Identification']
-        self._report_length = int(identification_section['report_length'])
+        self._report_length = identification_section['report_length']
 
         btn_section = self._config['Buttons']
-        self._btn_byte_index = int(btn_section['btn_byte_index'])
-
-        try:
-            self._btn = {
-                'TAKEOFF': int(btn_section['btn_takeoff_value']),
-                'LANDING': int(btn_section['btn_landing_value']),
-                'PHOTO': int(btn_section['btn_photo_value'])
-            }
-        except AttributeError:
-            raise ValueError(f'Failed to load correct button configuration.')
+        self._btn_byte_index = btn_section['btn_byte_index']
 
         analog_section = self._config['AnalogSticks']
 
         try:
-            self._analog_middle = int(analog_section['analog_middle_value'])
-            self._analog_threshold = int(analog_section['analog_threshold_value'])
-            self._axis_left_x = int(analog_section['analog_left_x_index'])
-            self._axis_left_y = int(analog_section['analog_left_y_index'])
-            self._axis_right_x = int(analog_section['analog_right_x_index'])
-            self._axis_right_y = int(analog_section['analog_right_y_index'])
-        except AttributeError:
+            self._axis_left_x = analog_section['analog_left_x_index']
+            self._axis_left_y = analog_section['analog_left_y_index']
+            self._axis_right_x = analog_section['analog_right_x_index']
+            self._axis_right_y = analog_section['analog_right_y_index']
+        except KeyError:
             raise ValueError(f'Failed to load correct analog stick configuration.')
 
-        self._axis_values = {
-            'left_x': self._analog_middle,
-            'left_y': self._analog_middle,
-            'right_x': self._analog_middle,
-            'right_y': self._analog_middle
-        }
-
+        used_indices = (
+            self._btn_byte_index,
+            self._axis_left_x,
+            self._axis_left_y,
+            self._axis_right_x,
+            self._axis_right_y
+        )
+        self._read_length = min(self._report_length, max(used_indices) + 1)
 
     def _close(self) -> None:
         """
-        Closes the connection to the controller.
+        Closes the connection to the controller, repeated calls are ignored.
 
         :return: None
         """
+        if not self._stop_reader():
+            return
+
         if self._controller:
             info('Disconnect from controller.')
             self._controller.close()
+            self._controller = None
 
     def _read_controller(self) -> None:
         """
         Reads and processes input data from a connected controller in a continuous loop.
+        Waits for a report with a blocking read, then drains all queued reports and
+        only decodes the latest one if it differs from the previously decoded report.
+        Reports are truncated after the last configured byte index and converted to
+        bytes, which are compared and indexed without per-item object handling.
+        The button byte is mapped to the button status through a table covering all
+        possible byte values.
+        Buttons pressed in any of the drained reports are published before the latest
+        state, so short presses are not lost.
 
         :return: None
         """
-        while True:
-            data = self._controller.read(self._report_length)
-
-            if data:
-                with self._lock:
-                    btn_state = data[self._btn_byte_index]
-
-                    for key in self._btn.keys():
-                        self._btn_status[key] = btn_state == self._btn[key]
-
-                    self._axis_values['right_x'] = data[self._axis_right_x]
-                    self._axis_values['right_y'] = data[self._axis_right_y]
-                    self._axis_values['left_x'] = data[self._axis_left_x]
-                    self._axis_values['left_y'] = data[self._axis_left_y]
-                    self._evaluate_analog_sticks()
-
-            sleep(self._DELAY)
+        read = self._controller.read
+        read_length = self._read_length
+        timeout = self._TIMEOUT
+        stop = self._stop
+        publish = self._publish_state
+        stick_lut = self._stick_lut
+        btn_byte_index = self._btn_byte_index
+        btn_masks = [0] * self._AXIS_RANGE
+
+        for key, bit in self._btn_bits.items():
+            btn_value = self._btn[key]
+
+            if 0 <= btn_value < self._AXIS_RANGE:
+                btn_masks[btn_value] |= bit
+
+        btn_masks = tuple(btn_masks)
+        extract_values = itemgetter(
+            btn_byte_index,
+            self._axis_right_x,
+            self._axis_right_y,
+            self._axis_left_x,
+            self._axis_left_y
+        )
+        last_data = None
+
+        while not stop.is_set():
+            data = None
+            pressed = 0
+            report = read(read_length, timeout_ms=timeout)
+
+            while report:
+                data = report
+                pressed |= btn_masks[report[btn_byte_index]]
+                report = read(read_length)
+
+            if not data:
+                continue
+
+            data = bytes(data)
+            btn_state, right_x, right_y, left_x, left_y = extract_values(data)
+            btn_status = btn_masks[btn_state]
+
+            if pressed != btn_status:
+                self._btn_status = pressed
+                publish()
+            elif data == last_data:
+                continue
+
+            last_data = data
+            self._btn_status = btn_status
+            self._right_stick_direction = stick_lut[(right_x << 8) | right_y]
+            self._left_stick_direction = stick_lut[(left_x << 8) | left_y]
+            publish()
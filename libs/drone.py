@@ -1,22 +1,22 @@
-from logging import getLogger, debug, info
-from atexit import register
-from time import sleep
-from typing import Optional
-from dataclasses import dataclass
+from logging import getLogger, debug, error, info
+from os import _exit
+from threading import Timer
+from time import monotonic, sleep
+from typing import Callable, NamedTuple, Optional
 from djitellopy import Tello
 
 
 logger = getLogger(__name__)
 
 
-@dataclass
-class SpeedVector:
+class SpeedVector(NamedTuple):
     """
     Represents a speed vector in a multidirectional space.
 
     This class is used for storing the components of a speed vector in four
     potential directions, including forward-backward, left-right, up-down, and
-    clockwise-counterclockwise.
+    clockwise-counterclockwise. The vector is immutable, a new speed is set by
+    assigning a new vector.
     """
 
     forward_backward: int = 0
@@ -31,18 +31,27 @@ class TelloDrone:
 
     :ivar _SPEED: The default speed (cm/s) for the drone.
     :ivar _DELAY: The delay (seconds) for the drone to takeoff/landing.
+    :ivar _KEEP_ALIVE: The interval (seconds) to repeat unchanged RC control values.
+    :ivar _CLOSE_COMMANDS: Number of commands (land, streamoff) which may be sent on close.
+    :ivar _CLOSE_MARGIN: Additional time (seconds) to land and disconnect before the process is ended.
     """
 
     _SPEED: int = 10
     _DELAY: float = 0.25
+    _KEEP_ALIVE: float = 1.0
+    _CLOSE_COMMANDS: int = 2
+    _CLOSE_MARGIN: float = 5.0
 
-    def __init__(self, speed: Optional[int] = None):
+    def __init__(self, speed: Optional[int] = None, before_exit: Optional[Callable[[], None]] = None):
         """
         Initializes the drone instance and performs initial setup.
 
         :param speed: The speed (cm/s) of the drone [10 - 100] Default: 10.
         :type speed: Optional[int]
+        :param before_exit: Function called before the process is ended because closing timed out.
+        :type before_exit: Optional[Callable[[], None]]
         """
+        self._before_exit = before_exit
         self.drone = Tello()
         self.drone.connect()
 
@@ -53,14 +62,66 @@ class TelloDrone:
         else:
             raise ValueError(f'Invalid speed value: "{speed}".')
 
-        register(self._close)
-
         self.grounded = True
         self.speed = SpeedVector()
+        self._last_rc = None
+        self._last_rc_time = 0.0
+
+    def __enter__(self) -> 'TelloDrone':
+        """
+        Enters the runtime context of the drone.
+
+        :return: The drone itself.
+        :rtype: TelloDrone
+        """
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Exits the runtime context of the drone, lands it and closes the connection. If this
+        does not finish within the time djitellopy may need for all of its retries, the
+        process is ended, so a blocked socket can not keep the application from stopping.
+
+        :return: None
+        """
+        timeout = self._CLOSE_MARGIN
+
+        if self.drone:
+            timeout += self._CLOSE_COMMANDS * self.drone.retry_count * self.drone.RESPONSE_TIMEOUT
+
+        watchdog = Timer(timeout, self._force_exit, args=(timeout,))
+        watchdog.daemon = True
+        watchdog.start()
+
+        try:
+            self._close()
+        finally:
+            watchdog.cancel()
+
+    def _force_exit(self, timeout: float) -> None:
+        """
+        Ends the process immediately, after the before_exit function had the chance to
+        release resources (e.g. to write pending log messages).
+
+        :param timeout: The time (seconds) after which closing the drone was given up.
+        :type timeout: float
+        :return: None
+        """
+        error(f'Drone not closed within {timeout:.0f}s, exit.')
+
+        if self._before_exit is not None:
+            try:
+                self._before_exit()
+            except Exception as err:
+                error(f'Failed to prepare exit: "{err}".')
+
+        _exit(1)
 
     def _close(self) -> None:
         """
-        Forces the drone to land if it is not already landed.
+        Forces the drone to land if it is not already landed. Afterwards the drone counts
+        as grounded and can not takeoff again, so later calls of start(), land() and
+        update_position() are ignored.
 
         :return: None
         """
@@ -70,17 +131,19 @@ class TelloDrone:
                 self.drone.land()
                 self.grounded = True
             self.drone.end()
+            self.drone = None
 
     def start(self) -> None:
         """
-        Start the drone's takeoff if drone is grounded.
+        Start the drone's takeoff if drone is grounded and not closed.
 
         :return: None
         """
-        if self.grounded:
+        if self.grounded and self.drone is not None:
             info('Takeoff drone.')
             self.drone.takeoff()
             self.grounded = False
+            self._last_rc = None
 
             sleep(self._DELAY)
             info('Drone is ready to fly by controller.')
@@ -95,26 +158,40 @@ class TelloDrone:
             info('Landing drone.')
             self.drone.land()
             self.grounded = True
+            self._last_rc = None
 
             sleep(self._DELAY)
             info('Drone is landed.')
 
     def update_position(self) -> None:
         """
-        Updates the drone's position based on current RC control values.
+        Updates the drone's position based on current RC control values. Unchanged values
+        are only sent again after the keep alive interval, so the drone does not land
+        automatically while hovering. Values djitellopy dropped, because they followed the
+        previous RC command too quickly, are not marked as sent and retried on the next call.
 
         :return: None
         """
         if not self.grounded:
-            debug(f'LR:{self.speed.left_right}')
-            debug(f'FB:{self.speed.forward_backward}')
-            debug(f'UD:{self.speed.up_down}')
-            debug(f'CC:{self.speed.clockwise_counterclockwise}')
+            drone = self.drone
+            speed = self.speed
+            rc = (speed.left_right, speed.forward_backward, speed.up_down, speed.clockwise_counterclockwise)
+            now = monotonic()
 
-            self.drone.send_rc_control(self.speed.left_right,
-                                       self.speed.forward_backward,
-                                       self.speed.up_down,
-                                       self.speed.clockwise_counterclockwise)
+            if rc == self._last_rc and now - self._last_rc_time < self._KEEP_ALIVE:
+                return
+
+            debug('LR:%s', rc[0])
+            debug('FB:%s', rc[1])
+            debug('UD:%s', rc[2])
+            debug('CC:%s', rc[3])
+
+            sent_before = drone.last_rc_control_timestamp
+            drone.send_rc_control(*rc)
+
+            if drone.last_rc_control_timestamp != sent_before:
+                self._last_rc = rc
+                self._last_rc_time = now
 
     def reset_rc_speed(self) -> None:
         """
@@ -123,9 +200,3 @@ class TelloDrone:
         :return: None
         """
         self.speed = SpeedVector()
-
-    def __del__(self):
-        """
-        Ensures resources are released properly.
-        """
-        self._close()
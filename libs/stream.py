@@ -1,12 +1,14 @@
 from atexit import register
+from functools import lru_cache
 from logging import getLogger, info, warning
 from pathlib import Path
-from threading import Event
-from time import strftime
-from typing import Tuple
+from queue import Queue, Empty, Full
+from threading import Event, Thread
+from time import monotonic, strftime
+from typing import Callable, Dict, Tuple
 import cv2
 import numpy as np
-from djitellopy import Tello
+from djitellopy import BackgroundFrameRead, Tello
 
 
 logger = getLogger(__name__)
@@ -22,6 +24,11 @@ class VideoStream:
     :ivar _YELLOW_COLOR: Warning color (yellow) indicating caution zones.
     :ivar _RED_COLOR: Critical status color (red), used for alerts.
     :ivar _BLACK_COLOR: Color (black) for outlines and contrast-enhancing.
+    :ivar _WARNING_INTERVAL: Minimum time (seconds) between repeated stream warnings.
+    :ivar _MAX_FPS: Maximum number of frames per second which are processed and displayed.
+    :ivar _POLL_INTERVAL: Time (seconds) to wait for a new frame before polling again.
+    :ivar _BUFFER_COUNT: Number of frame buffers shared by the processing and display loop.
+    :ivar _PHOTO_TIMEOUT: Maximum time (seconds) to wait for pending photos to be saved on close.
     """
 
     _MARGIN: int = 20
@@ -30,6 +37,11 @@ class VideoStream:
     _YELLOW_COLOR: Tuple[int, int, int] = (0, 255, 255)
     _RED_COLOR: Tuple[int, int, int] = (0, 0, 255)
     _BLACK_COLOR: Tuple[int, int, int] = (0, 0, 0)
+    _WARNING_INTERVAL: float = 1.0
+    _MAX_FPS: int = 30
+    _POLL_INTERVAL: float = 0.001
+    _BUFFER_COUNT: int = 3
+    _PHOTO_TIMEOUT: float = 5.0
 
     def __init__(self, drone_object: Tello, window_name: str, shutdown_flag: Event):
         """
@@ -47,9 +59,60 @@ class VideoStream:
         self._running = False
         self._shutdown = shutdown_flag
         self._last_frame = None
+        self._battery_sprites: Dict[Tuple[Tuple[int, int, int], int], Tuple[int, int, np.ndarray, np.ndarray]] = {}
+        self._scale_sprites: Dict[Tuple[int, int], Tuple[int, int, np.ndarray, np.ndarray]] = {}
+        self._photo_queue: Queue = Queue()
+        self._photo_thread = Thread(target=self._photo_loop, daemon=True)
+        self._photo_thread.start()
 
         register(self._close)
 
+    @staticmethod
+    def _render_sprite(height: int, width: int, draw: Callable[[np.ndarray], None]) -> Tuple[int, int, np.ndarray, np.ndarray]:
+        """
+        Renders HUD elements once onto an empty canvas and crops them to their bounding
+        box, so they can be copied onto every frame instead of being drawn again.
+
+        :param height: The height of the canvas.
+        :type height: int
+        :param width: The width of the canvas.
+        :type width: int
+        :param draw: The function drawing the HUD elements onto the canvas.
+        :type draw: Callable[[np.ndarray], None]
+        :return: The x and y offset, the cropped image and the mask of the drawn pixels.
+        :rtype: Tuple[int, int, np.ndarray, np.ndarray]
+        """
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        draw(canvas)
+
+        mask = canvas.any(axis=2)
+        rows = np.flatnonzero(mask.any(axis=1))
+        columns = np.flatnonzero(mask.any(axis=0))
+
+        if not rows.size:
+            return 0, 0, canvas[:1, :1].copy(), np.zeros((1, 1), dtype=np.uint8)
+
+        y1, y2 = rows[0], rows[-1] + 1
+        x1, x2 = columns[0], columns[-1] + 1
+
+        return x1, y1, canvas[y1:y2, x1:x2].copy(), mask[y1:y2, x1:x2].astype(np.uint8)
+
+    @staticmethod
+    def _blit_sprite(img: np.ndarray, sprite: Tuple[int, int, np.ndarray, np.ndarray]) -> None:
+        """
+        Copies the drawn pixels of a rendered sprite onto an image.
+
+        :param img: The image to copy the sprite on.
+        :type img: np.ndarray
+        :param sprite: The sprite created by _render_sprite.
+        :type sprite: Tuple[int, int, np.ndarray, np.ndarray]
+        :return: None
+        """
+        x, y, image, mask = sprite
+        sprite_height, sprite_width = image.shape[:2]
+
+        cv2.copyTo(image, mask, img[y:y + sprite_height, x:x + sprite_width])
+
     @staticmethod
     def _draw_rounded_rectangle(img: np.array, top_left: tuple, bottom_right: tuple, color: tuple, radius: int) -> None:
         """
@@ -79,6 +142,38 @@ class VideoStream:
         cv2.ellipse(img, (x1 + radius, y2 - radius), (radius, radius), 90, 0, 90, color, 2)
         cv2.ellipse(img, (x2 - radius, y2 - radius), (radius, radius), 0, 0, 90, color, 2)
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _battery_level(percent: int) -> Tuple[Tuple[int, int, int], int]:
+        """
+        Determines the color and the number of filled blocks of the battery symbol. The
+        result is cached per percentage, so the thresholds are evaluated only once.
+
+        :param percent: The battery percentage.
+        :type percent: int
+        :return: The color and the number of filled blocks.
+        :rtype: Tuple[Tuple[int, int, int], int]
+        """
+        if percent >= 75:
+            color = VideoStream._GREEN_COLOR
+        elif percent >= 20:
+            color = VideoStream._YELLOW_COLOR
+        else:
+            color = VideoStream._RED_COLOR
+
+        if percent >= 80:
+            block_count = 4
+        elif percent >= 60:
+            block_count = 3
+        elif percent >= 40:
+            block_count = 2
+        elif percent >= 20:
+            block_count = 1
+        else:
+            block_count = 0
+
+        return color, block_count
+
     @staticmethod
     def _draw_battery(img: np.array, top_left: tuple, bottom_right: tuple, percent: int, radius: int = 10) -> None:
         """
@@ -98,13 +193,7 @@ class VideoStream:
         """
         x1, y1 = top_left
         x2, y2 = bottom_right
-
-        if percent >= 75:
-            color = VideoStream._GREEN_COLOR
-        elif percent >= 20:
-            color = VideoStream._YELLOW_COLOR
-        else:
-            color = VideoStream._RED_COLOR
+        color, block_count = VideoStream._battery_level(percent)
 
         VideoStream._draw_rounded_rectangle(img, top_left, bottom_right, color, radius)
 
@@ -117,17 +206,6 @@ class VideoStream:
 
         cv2.rectangle(img, (pin_x1, pin_y1), (pin_x2, pin_y2), color, -1)
 
-        if percent >= 80:
-            block_count = 4
-        elif percent >= 60:
-            block_count = 3
-        elif percent >= 40:
-            block_count = 2
-        elif percent >= 20:
-            block_count = 1
-        else:
-            block_count = 0
-
         padding: int = 10
         total_blocks: int = 4
         available_width = x2 - x1 - 2 * padding
@@ -143,7 +221,8 @@ class VideoStream:
             cv2.rectangle(img, (bx1, by1), (bx2, by2), color, -1)
 
     @staticmethod
-    def _draw_scale_slider(img: np.array, pos_x: int, pos_y: int, color: Tuple[int, int, int]) -> None:
+    def _draw_scale_slider(img: np.array, pos_x: int, pos_y: int, color: Tuple[int, int, int],
+                           outline_color: Tuple[int, int, int] = _BLACK_COLOR) -> None:
         """
         Draws a slider representing flight height of the drone on the HUD.
 
@@ -155,14 +234,48 @@ class VideoStream:
         :type pos_y: int
         :param color: The color of the slider in a BGR tuple format.
         :type color: Tuple[int, int, int]
+        :param outline_color: The color of the slider outline in a BGR tuple format. Default: black.
+        :type outline_color: Tuple[int, int, int]
         :return: None
         """
         x = pos_x
         y = pos_y
 
-        points = np.array([[x, y], [x - 10, y + 10], [x - 60, y + 10], [x - 60, y - 10], [x - 10, y - 10]])
+        points = np.array([[x, y], [x - 10, y + 10], [x - 60, y + 10], [x - 60, y - 10], [x - 10, y - 10]], dtype=np.int32)
         cv2.fillPoly(img, [points], color=color)
-        cv2.polylines(img, [points], isClosed=True, color=VideoStream._BLACK_COLOR, thickness=1)
+        cv2.polylines(img, [points], isClosed=True, color=outline_color, thickness=1)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _slider_sprite(color: Tuple[int, int, int]) -> Tuple[int, int, np.ndarray, np.ndarray]:
+        """
+        Renders the slider once per color, so it only has to be copied onto every frame
+        at the current flight height. The mask is rendered separately, because the black
+        outline of the slider has to be copied as well.
+
+        :param color: The color of the slider in a BGR tuple format.
+        :type color: Tuple[int, int, int]
+        :return: The x and y offset relative to the slider position, the image and the mask.
+        :rtype: Tuple[int, int, np.ndarray, np.ndarray]
+        """
+        slider_width: int = 61
+        slider_height: int = 21
+        pos_x = slider_width - 1
+        pos_y = slider_height // 2
+
+        image = np.zeros((slider_height, slider_width, 3), dtype=np.uint8)
+        VideoStream._draw_scale_slider(img=image, pos_x=pos_x, pos_y=pos_y, color=color)
+
+        mask = np.zeros((slider_height, slider_width, 3), dtype=np.uint8)
+        VideoStream._draw_scale_slider(
+            img=mask,
+            pos_x=pos_x,
+            pos_y=pos_y,
+            color=VideoStream._WHITE_COLOR,
+            outline_color=VideoStream._WHITE_COLOR
+        )
+
+        return -pos_x, -pos_y, image, mask.any(axis=2).astype(np.uint8)
 
     @staticmethod
     def _draw_scale(img: np.array, pos_x: int, height: int) -> None:
@@ -184,13 +297,14 @@ class VideoStream:
         short_length: int = 10
         long_length: int = 20
 
-        for y in range(start_y, eny_y + 1, spacing):
-            if (y - start_y) % 10 == 0:
-                line_length = long_length
-            else:
-                line_length = short_length
+        ys = np.arange(start_y, eny_y + 1, spacing, dtype=np.int32)
+        lengths = np.where((ys - start_y) % 10 == 0, long_length, short_length).astype(np.int32)
+        segments = np.empty((ys.size, 2, 2), dtype=np.int32)
+        segments[:, 0, 0] = pos_x - lengths
+        segments[:, 1, 0] = pos_x
+        segments[:, :, 1] = ys[:, np.newaxis]
 
-            cv2.line(img, (pos_x - line_length, y), (pos_x, y), VideoStream._WHITE_COLOR, 1)
+        cv2.polylines(img, list(segments), isClosed=False, color=VideoStream._WHITE_COLOR, thickness=1)
 
     def _close(self) -> None:
         """
@@ -198,10 +312,16 @@ class VideoStream:
 
         :return: None
         """
-        info('Force stream stop.')
-        self._drone.streamoff()
+        if self._drone.stream_on:
+            info('Force stream stop.')
+            self._drone.streamoff()
+
         cv2.destroyAllWindows()
 
+        if self._photo_thread.is_alive():
+            self._photo_queue.put(None)
+            self._photo_thread.join(timeout=self._PHOTO_TIMEOUT)
+
     def _read_drone_metrics(self) -> Tuple[int, int]:
         """
         Fetches battery and height metrics from Tello drone.
@@ -217,6 +337,8 @@ class VideoStream:
     def _draw_information(self, frame: np.array) -> None:
         """
         Displays drone metrics such as battery status and flight time on current frame.
+        The battery symbol, the slider and the scale are rendered once per battery level,
+        slider color and frame size and then only copied onto the frame.
 
         :param frame: The current frame to overlay the metrics on.
         :type frame: np.array
@@ -246,14 +368,101 @@ class VideoStream:
         slider_pos_x = scale_pos_x - 25
         slider_pos_y = int(slider_max_y - (current_flight_height / max_flight_height) * (slider_max_y - slider_min_y))
 
-        VideoStream._draw_battery(img=frame, top_left=battery_pos_1, bottom_right=battery_pos_2, percent=battery)
-        VideoStream._draw_scale_slider(img=frame, pos_x=slider_pos_x, pos_y=slider_pos_y, color=slider_color)
-        VideoStream._draw_scale(img=frame, pos_x=scale_pos_x, height=scale_height)
+        battery_level = self._battery_level(battery)
+        battery_sprite = self._battery_sprites.get(battery_level)
+
+        if battery_sprite is None:
+            battery_sprite = self._render_sprite(
+                height,
+                width,
+                lambda img: VideoStream._draw_battery(img=img, top_left=battery_pos_1, bottom_right=battery_pos_2, percent=battery)
+            )
+            self._battery_sprites[battery_level] = battery_sprite
+
+        scale_sprite = self._scale_sprites.get((height, width))
+
+        if scale_sprite is None:
+            scale_sprite = self._render_sprite(
+                height,
+                width,
+                lambda img: VideoStream._draw_scale(img=img, pos_x=scale_pos_x, height=scale_height)
+            )
+            self._scale_sprites[(height, width)] = scale_sprite
+
+        offset_x, offset_y, slider_image, slider_mask = self._slider_sprite(slider_color)
+        slider_sprite = (slider_pos_x + offset_x, slider_pos_y + offset_y, slider_image, slider_mask)
+
+        VideoStream._blit_sprite(img=frame, sprite=battery_sprite)
+        VideoStream._blit_sprite(img=frame, sprite=slider_sprite)
+        VideoStream._blit_sprite(img=frame, sprite=scale_sprite)
+
+    def _process_loop(self, frame_reader: BackgroundFrameRead, ready_frames: Queue, free_buffers: Queue) -> None:
+        """
+        Executes the loop which mirrors new video frames from the drone and draws the HUD
+        onto them. Frames are only processed once and at most _MAX_FPS times per second,
+        the frame reader provides a new array for every decoded frame. Each frame is
+        written into a free buffer and handed over to the display loop, a frame which
+        was not displayed yet is replaced by the newer one.
+
+        :param frame_reader: The frame reader of the drone video stream.
+        :type frame_reader: BackgroundFrameRead
+        :param ready_frames: The processed frame which is ready to be displayed.
+        :type ready_frames: Queue
+        :param free_buffers: The buffers which can be used for the next frames.
+        :type free_buffers: Queue
+        :return: None
+        """
+        last_frame = None
+        last_warning = None
+        last_processed = None
+        frame_interval = 1 / self._MAX_FPS
+
+        while self._running and not self._shutdown.is_set():
+            bgr_frame = frame_reader.frame
+            now = monotonic()
+
+            if bgr_frame is None:
+                if last_warning is None or now - last_warning >= self._WARNING_INTERVAL:
+                    warning('No frame received.')
+                    last_warning = now
+            elif bgr_frame is not last_frame and (last_processed is None or now - last_processed >= frame_interval):
+                try:
+                    frame_buffer = free_buffers.get(timeout=self._POLL_INTERVAL)
+                except Empty:
+                    continue
+
+                last_frame = bgr_frame
+                last_processed = now
+
+                if frame_buffer is None or frame_buffer.shape != bgr_frame.shape:
+                    frame_buffer = np.empty(bgr_frame.shape, dtype=np.uint8)
+
+                np.copyto(frame_buffer, bgr_frame[:, ::-1, ::-1], casting='unsafe')
+                self._last_frame = bgr_frame
+
+                self._draw_information(frame=frame_buffer)
+
+                try:
+                    ready_frames.put_nowait(frame_buffer)
+                except Full:
+                    try:
+                        free_buffers.put_nowait(ready_frames.get_nowait())
+                    except Empty:
+                        pass
+
+                    ready_frames.put_nowait(frame_buffer)
+
+                continue
+
+            self._shutdown.wait(self._POLL_INTERVAL)
 
     def _stream_loop(self) -> None:
         """
-        Executes the main loop to process video frames from the drone, allowing real-time
-        display of the stream, and handles user input for terminating the stream.
+        Executes the main loop to display the processed video frames from the drone, allowing
+        real-time display of the stream, and handles user input for terminating the stream.
+        The frames are processed on a separate thread, so the GUI (which must stay on the
+        main thread) and the frame processing run in parallel. The q or Esc key sets the
+        shutdown flag, which ends the loop and the application.
 
         :return: None
         """
@@ -261,29 +470,34 @@ class VideoStream:
 
         cv2.namedWindow(self._window_name, cv2.WINDOW_AUTOSIZE)
         frame_reader = self._drone.get_frame_read()
+        poll_key = getattr(cv2, 'pollKey', None) or (lambda: cv2.waitKey(1))
 
-        while self._running and not self._shutdown.is_set():
-            bgr_frame = frame_reader.frame
-
-            if bgr_frame is None:
-                warning('No frame received.')
-                continue
+        ready_frames = Queue(maxsize=1)
+        free_buffers = Queue()
 
-            if bgr_frame.dtype != np.uint8:
-                bgr_frame = bgr_frame.astype(np.uint8)
+        for _ in range(self._BUFFER_COUNT):
+            free_buffers.put_nowait(None)
 
-            rgb_frame = cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB)
-            flipped_frame = cv2.flip(rgb_frame, 1)
-            self._last_frame = flipped_frame.copy()
+        process_thread = Thread(target=self._process_loop, args=(frame_reader, ready_frames, free_buffers), daemon=True)
+        process_thread.start()
 
-            self._draw_information(frame=flipped_frame)
+        try:
+            while self._running and not self._shutdown.is_set():
+                try:
+                    frame = ready_frames.get(timeout=self._POLL_INTERVAL)
+                except Empty:
+                    pass
+                else:
+                    cv2.imshow(self._window_name, frame)
+                    free_buffers.put_nowait(frame)
 
-            cv2.imshow(self._window_name, flipped_frame)
+                key = poll_key() & 0xFF
 
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q') or key == 27:
-                self._running = False
-                raise KeyboardInterrupt
+                if key == ord('q') or key == 27:
+                    self._shutdown.set()
+        finally:
+            self._running = False
+            process_thread.join(timeout=1)
 
         self._close()
 
@@ -305,25 +519,44 @@ class VideoStream:
         """
         self._running = False
 
-    def capture_photo(self) -> None:
+    def _photo_loop(self) -> None:
         """
-        Captures photo from a video stream and saves it as an image PNG file.
+        Executes the loop which saves the captured photos as image PNG files, so encoding
+        and writing never block the caller of capture_photo. The loop ends with None.
 
         :return: None
         """
-        image = self._last_frame if hasattr(self, "_last_frame") else None
+        target_path = Path('photos')
 
-        if image is not None:
-            info('Capture photo from stream.')
-            timestamp = strftime('%Y%m%d_%H%M%S')
-            filename = f'photo_{timestamp}.png'
-            target_path = Path('photos')
+        while True:
+            photo = self._photo_queue.get()
+
+            if photo is None:
+                break
+
+            frame, timestamp = photo
+            image = np.ascontiguousarray(frame[:, ::-1, ::-1], dtype=np.uint8)
             target_path.mkdir(exist_ok=True)
 
-            filename = target_path / filename
+            filename = target_path / f'photo_{timestamp}.png'
+
+            if cv2.imwrite(str(filename), image):
+                info(f'Photo saved to "{filename}".')
+            else:
+                warning(f'Photo could not be saved to "{filename}".')
 
-            cv2.imwrite(str(filename), image)
-            info(f'Photo saved to "{filename}".')
+    def capture_photo(self) -> None:
+        """
+        Captures photo from a video stream and hands it over to be saved as an image PNG
+        file. The last frame is kept as received from the drone, it is mirrored and saved
+        on a separate thread.
 
+        :return: None
+        """
+        frame = self._last_frame
+
+        if frame is not None:
+            info('Capture photo from stream.')
+            self._photo_queue.put((frame, strftime('%Y%m%d_%H%M%S')))
         else:
             warning('No frame from stream captured.')
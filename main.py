@@ -1,27 +1,50 @@
-from logging import basicConfig, info
+import os
+from array import array
+from atexit import register
+from ctypes import CDLL, get_errno
+from gc import collect, freeze
+from logging import basicConfig, debug, info, Formatter, StreamHandler
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 from signal import signal, SIGINT
-from sys import exit
+from sys import exit, platform
 from threading import Thread, Event
-from time import sleep
+from time import monotonic_ns
 from types import FrameType
-from typing import Optional
+from typing import List, Mapping, Optional, Tuple, TYPE_CHECKING
 from libs.controller_base import BaseController
 from libs.controller_factory import ControllerFactory
-from libs.drone import TelloDrone
-from libs.stream import VideoStream
+from libs.drone import SpeedVector, TelloDrone
+
+if TYPE_CHECKING:
+    from libs.stream import VideoStream
 
 
 CONTROLLER_CONFIG: str = 'stadia_macos.ini'
 SPEED: int = 60
+SPEED_STEPS: Tuple[int, int, int] = (-SPEED, 0, SPEED)
 STREAM: bool = True
 WINDOW_NAME: str = 'DJI Tello Drone HUD'
-DELAY: float = 0.008
+TELEMETRY_INTERVAL: float = 0.2
+NANOSECONDS: int = 1_000_000_000
+DELAY_BUCKET: int = 100_000
+DELAY_BUCKETS: int = 64
+JITTER_LOG_INTERVAL: float = 1.0
 SHUTDOWN: Event = Event()
+LOOPS_STARTED: Event = Event()
+RECEIVED_SIGNALS: List[int] = []
+REALTIME_PRIORITY: int = 50
+TIMER_SLACK: int = 1
+PR_SET_TIMERSLACK: int = 29
+LATCHED_BUTTONS: Tuple[str, ...] = ('TAKEOFF', 'LANDING', 'PHOTO')
 
 
 def signal_handler(sig: int, frame: Optional[FrameType]) -> None:
     """
-    Handles incoming system signals and raises always an KeyboardInterrupt.
+    Handles incoming system signals and sets the shutdown flag, so all loops stop and
+    the application shuts down through the regular cleanup. The signal is only recorded
+    here and logged after the loops have been left. Until the loops are started, the
+    first signal raises a KeyboardInterrupt, so a blocking startup step is aborted.
 
     :param sig: The signal number.
     :type sig: int
@@ -31,13 +54,114 @@ def signal_handler(sig: int, frame: Optional[FrameType]) -> None:
     """
     _ = frame
 
-    info(f'Signal: "{sig}" received.')
-    raise KeyboardInterrupt
+    RECEIVED_SIGNALS.append(sig)
+    interrupt_startup = not LOOPS_STARTED.is_set() and not SHUTDOWN.is_set()
+    SHUTDOWN.set()
+
+    if interrupt_startup:
+        raise KeyboardInterrupt
+
+
+def raise_thread_priority() -> None:
+    """
+    Tries to run the calling thread with the real-time scheduling policy SCHED_FIFO, so
+    the controller loop is not delayed by other processes. This is only supported on
+    Linux and requires the permission to do so, otherwise the default policy is kept.
+
+    :return: None
+    """
+    if not hasattr(os, 'sched_setscheduler'):
+        return
+
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(REALTIME_PRIORITY))
+        info(f'Controller loop runs with real-time priority "{REALTIME_PRIORITY}".')
+    except OSError as err:
+        debug(f'Real-time priority not available: {err}')
+
+
+def reduce_timer_slack() -> None:
+    """
+    Tries to reduce the timer slack (nanoseconds) of the calling thread, by which Linux
+    may delay timed waits, so the controller loop wakes up closer to its deadlines. On
+    other systems or if the call fails, the default timer slack is kept.
+
+    :return: None
+    """
+    if not platform.startswith('linux'):
+        return
+
+    try:
+        libc = CDLL(None, use_errno=True)
+
+        if libc.prctl(PR_SET_TIMERSLACK, TIMER_SLACK, 0, 0, 0) != 0:
+            raise OSError(get_errno(), 'prctl(PR_SET_TIMERSLACK) failed')
+    except (AttributeError, OSError) as err:
+        debug(f'Timer slack not changed: {err}')
+
+
+def calculate_speed(stick_right: Mapping[str, bool], stick_left: Mapping[str, bool]) -> SpeedVector:
+    """
+    Calculates the speed vector of the drone from the directions of both analog sticks.
+    The difference of two opposite directions selects the speed from SPEED_STEPS.
+
+    :param stick_right: The state of the right analog stick.
+    :type stick_right: Mapping[str, bool]
+    :param stick_left: The state of the left analog stick.
+    :type stick_left: Mapping[str, bool]
+    :return: The speed vector for the RC control of the drone.
+    :rtype: SpeedVector
+    """
+    steps = SPEED_STEPS
+
+    return SpeedVector(
+        forward_backward=steps[stick_right['forward'] - stick_right['backward'] + 1],
+        left_right=steps[stick_right['right'] - stick_right['left'] + 1],
+        up_down=steps[stick_left['up'] - stick_left['down'] + 1],
+        clockwise_counterclockwise=steps[stick_left['counterclockwise'] - stick_left['clockwise'] + 1]
+    )
+
+
+def log_telemetry_delays(histogram: array, overruns: int, missed_deadlines: int, max_delay: int) -> None:
+    """
+    Logs how late the telemetry ticks of the controller loop have been, so changes of the
+    loop timing can be compared between runs.
+
+    :param histogram: The number of ticks per delay bucket of DELAY_BUCKET nanoseconds.
+    :type histogram: array
+    :param overruns: The number of ticks which were late by more than half an interval.
+    :type overruns: int
+    :param missed_deadlines: The number of ticks which missed the following deadline too.
+    :type missed_deadlines: int
+    :param max_delay: The maximum delay (nanoseconds) of a tick.
+    :type max_delay: int
+    :return: None
+    """
+    ticks = sum(histogram)
 
+    if not ticks:
+        return
 
-def controller_loop(controller_obj: BaseController, drone_obj: TelloDrone, stream_obj: Optional[VideoStream] = None) -> None:
+    info(f'Telemetry ticks: {ticks}, overruns: {overruns}, missed deadlines: {missed_deadlines}, '
+         f'max delay: {max_delay / NANOSECONDS:.6f}s.')
+
+    for index, count in enumerate(histogram):
+        if count:
+            info(f'Telemetry delay {index * DELAY_BUCKET // 1000}us+: {count}')
+
+
+def controller_loop(controller_obj: BaseController, drone_obj: TelloDrone, stream_obj: Optional['VideoStream'] = None) -> None:
     """
     Controls the main loop driving the interaction between a game controller and a drone.
+    The speed is calculated by the controller callback on the reader thread, so sending
+    the RC commands never delays reading the controller. The state is read again after
+    the callback has been registered, so no change in between is lost. The loop wakes up on every
+    controller state change and at least every telemetry interval, at which the battery
+    is read again. The telemetry deadlines are absolute integer nanoseconds, so the
+    interval does not drift with the time spent in the loop, their delays are logged
+    every JITTER_LOG_INTERVAL (debug) and summarized at the end. Presses of the latched
+    buttons are counted by the callback, so a short press is not missed while the loop
+    is busy.
 
     :param controller_obj: The controller object.
     :type controller_obj: Controller
@@ -47,95 +171,177 @@ def controller_loop(controller_obj: BaseController, drone_obj: TelloDrone, strea
     :type stream_obj: Optional[VideoStream]
     :return: None
     """
-    photo_triggered = False
+    raise_thread_priority()
+    reduce_timer_slack()
+
+    state = controller_obj.get_state()
+    state_changed = Event()
+    button_presses = dict.fromkeys(LATCHED_BUTTONS, 0)
+    handled_presses = dict(button_presses)
+
+    def on_state_change(buttons: Mapping[str, bool], right_stick: Mapping[str, bool], left_stick: Mapping[str, bool]) -> None:
+        nonlocal state
+        previous_buttons = state[0]
+
+        for name in LATCHED_BUTTONS:
+            if buttons[name] and not previous_buttons[name]:
+                button_presses[name] += 1
+
+        drone_obj.speed = calculate_speed(right_stick, left_stick)
+        state = (buttons, right_stick, left_stick)
+        state_changed.set()
+
+    controller_obj.on_change(on_state_change)
+    state = controller_obj.get_state()
+    drone_obj.speed = calculate_speed(state[1], state[2])
+
+    get_battery = drone_obj.drone.get_battery
+    update_position = drone_obj.update_position
+    wait_for_change = state_changed.wait
+    clear_change = state_changed.clear
+    clock = monotonic_ns
+    shutdown_requested = SHUTDOWN.is_set
+    telemetry_interval = round(TELEMETRY_INTERVAL * NANOSECONDS)
+    latched_buttons = LATCHED_BUTTONS
+
+    battery = get_battery()
+    next_telemetry = clock() + telemetry_interval
+    missed_deadlines = 0
+    overruns = 0
+    max_delay = 0
+    delay_histogram = array('I', [0]) * DELAY_BUCKETS
+    jitter_interval = round(JITTER_LOG_INTERVAL * NANOSECONDS)
+    next_jitter_log = clock() + jitter_interval
+    window_ticks = 0
+    window_total = 0
+    window_min = 0
+    window_max = 0
 
-    while True:
-        drone_obj.reset_rc_speed()
-
-        battery = drone_obj.drone.get_battery()
+    try:
+        while not shutdown_requested():
+            wait_for_change(timeout=max(0, next_telemetry - clock()) / NANOSECONDS)
+            clear_change()
 
-        if battery < 5:
-            info(f'Battery is less "{battery}%".')
-            break
+            now = clock()
 
-        btn = controller_obj.get_btn_status()
+            if now >= next_telemetry:
+                battery = get_battery()
+                delay = now - next_telemetry
+                next_telemetry += telemetry_interval
+                delay_histogram[min(delay // DELAY_BUCKET, DELAY_BUCKETS - 1)] += 1
 
-        if btn['TAKEOFF'] and battery > 10:
-            drone_obj.start()
+                if delay > max_delay:
+                    max_delay = delay
 
-        if btn['LANDING'] or battery < 10:
-            drone_obj.land()
+                if delay > telemetry_interval // 2:
+                    overruns += 1
 
-        if btn['PHOTO'] and stream_obj is not None and not photo_triggered:
-            photo_triggered = True
-            stream_obj.capture_photo()
-        elif not btn['PHOTO']:
-            photo_triggered = False
+                if not window_ticks or delay < window_min:
+                    window_min = delay
 
-        stick_right = controller_obj.get_analog_right_stick()
+                if not window_ticks or delay > window_max:
+                    window_max = delay
 
-        if stick_right['forward']:
-            drone_obj.speed.forward_backward = SPEED
+                window_ticks += 1
+                window_total += delay
 
-        if stick_right['backward']:
-            drone_obj.speed.forward_backward = -SPEED
+                if now >= next_jitter_log:
+                    debug(f'Telemetry delay min: {window_min / NANOSECONDS:.6f}s, max: {window_max / NANOSECONDS:.6f}s, '
+                          f'avg: {window_total / window_ticks / NANOSECONDS:.6f}s ({window_ticks} ticks).')
+                    next_jitter_log += jitter_interval
+                    window_ticks = 0
+                    window_total = 0
 
-        if stick_right['left']:
-            drone_obj.speed.left_right = -SPEED
+                    if next_jitter_log <= now:
+                        next_jitter_log = now + jitter_interval
 
-        if stick_right['right']:
-            drone_obj.speed.left_right = SPEED
+                if next_telemetry <= now:
+                    missed_deadlines += 1
+                    debug(f'Telemetry deadline missed by {delay / NANOSECONDS:.3f}s ({missed_deadlines} total).')
+                    next_telemetry = now + telemetry_interval
 
-        stick_left = controller_obj.get_analog_left_stick()
+            if battery < 5:
+                info(f'Battery is less "{battery}%".')
+                break
 
-        if stick_left['up']:
-            drone_obj.speed.up_down = SPEED
+            btn = state[0]
+            presses = dict(button_presses)
+            pressed = {name: presses[name] != handled_presses[name] for name in latched_buttons}
+            handled_presses = presses
 
-        if stick_left['down']:
-            drone_obj.speed.up_down = -SPEED
+            if (btn['TAKEOFF'] or pressed['TAKEOFF']) and battery > 10:
+                drone_obj.start()
 
-        if stick_left['clockwise']:
-            drone_obj.speed.clockwise_counterclockwise = -SPEED
+            if btn['LANDING'] or pressed['LANDING'] or battery < 10:
+                drone_obj.land()
 
-        if stick_left['counterclockwise']:
-            drone_obj.speed.clockwise_counterclockwise = SPEED
+            if pressed['PHOTO'] and stream_obj is not None:
+                stream_obj.capture_photo()
 
-        drone_obj.update_position()
-        sleep(DELAY)
+            update_position()
+    finally:
+        log_telemetry_delays(delay_histogram, overruns, missed_deadlines, max_delay)
 
 
 if __name__ == "__main__":
+    log_queue = SimpleQueue()
+    log_handler = StreamHandler()
+    log_handler.setFormatter(Formatter('[%(levelname)s] %(message)s'))
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(Formatter('%(message)s'))
+    log_listener = QueueListener(log_queue, log_handler)
+
     basicConfig(
         level='INFO',
-        format='[%(levelname)s] %(message)s'
+        handlers=[queue_handler]
     )
 
+    log_listener.start()
+    register(log_listener.stop)
+
     signal(SIGINT, signal_handler)
 
     controller_thread = None
     stream = None
 
     factory = ControllerFactory()
-    controller = factory.create(name=CONTROLLER_CONFIG)
-    tello = TelloDrone()
 
     try:
-        if STREAM:
-            stream = VideoStream(drone_object=tello.drone, window_name=WINDOW_NAME, shutdown_flag=SHUTDOWN)
-            controller_thread = Thread(target=controller_loop, args=(controller, tello, stream), daemon=True)
-
-            controller_thread.start()
-            stream.start_stream()
-        else:
-            controller_loop(controller, tello)
+        with factory.create(name=CONTROLLER_CONFIG) as controller, TelloDrone(before_exit=log_listener.stop) as tello:
+            collect()
+            freeze()
+            LOOPS_STARTED.set()
+
+            try:
+                if STREAM:
+                    from libs.stream import VideoStream
+
+                    stream = VideoStream(drone_object=tello.drone, window_name=WINDOW_NAME, shutdown_flag=SHUTDOWN)
+                    controller_thread = Thread(target=controller_loop, args=(controller, tello, stream), daemon=True)
+
+                    controller_thread.start()
+                    stream.start_stream()
+                else:
+                    controller_loop(controller, tello)
+            finally:
+                for received_signal in RECEIVED_SIGNALS:
+                    info(f'Signal: "{received_signal}" received.')
+
+                if SHUTDOWN.is_set():
+                    info('Application stopped by user.')
+
+                if STREAM:
+                    SHUTDOWN.set()
+
+                    if controller_thread is not None:
+                        controller_thread.join()
+
+                    if stream is not None:
+                        stream.stop_stream()
     except KeyboardInterrupt:
-        info('Application stopped by user.')
-    finally:
-        if STREAM:
-            SHUTDOWN.set()
-            controller_thread.join(timeout=1)
-            stream.stop_stream()
-
-        del tello
-        del controller
-        exit(0)
+        for received_signal in RECEIVED_SIGNALS:
+            info(f'Signal: "{received_signal}" received.')
+
+        info('Application stopped by user during startup.')
+
+    exit(0)